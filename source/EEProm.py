@@ -7,15 +7,15 @@ https://ww1.microchip.com/downloads/en/DeviceDoc/doc0270.pdf
 # pylint error is for snake_case, but also covers short names
 # pylint: disable=C0103
 
-from typing import List, Tuple
-from nmigen import Array, ClockDomain, Elaboratable, Module, Mux, Signal
-from nmigen.build import Platform
+from typing import List, Optional, Tuple
+from nmigen import Module, Signal
 from nmigen.sim import Simulator, Delay
 from nmigen.asserts import Assert, Assume, Cover, Fell, Past, Rose, Stable
-from util import main
+from MemBlock import MemBlock
+from util import Step, main, stimulus, trace_vcd
 
 
-class EEProm(Elaboratable):
+class EEProm(MemBlock):
     """
     A ROM similar to a 28C64-like IC
     https://ww1.microchip.com/downloads/en/DeviceDoc/doc0270.pdf
@@ -28,125 +28,73 @@ class EEProm(Elaboratable):
         [I] _we:    Write enable (active low)
             /: `__mem[a] := io_in`
     """
+    names = ("a", "io_in", "io_out")
     a: Signal
     io_in: Signal
     io_out: Signal
-    _oe: Signal
-    _we: Signal
     a_bits: int
     io_bits: int
-    __mem: Array
 
-    def __init__(self, data_bits: int, addr_bits: int):
+    def __init__(self, data_bits: int, addr_bits: int, simulate: bool = True):
         """
         Constructs a `EEProm`
 
         Arguments:
             data_bits: The width of the data bus
             addr_bits: The width of the address bus
+            simulate:  Whether the `EEProm` will be run under nMigen's simulator
+                       (see `MemBlock`; if `False`, simulated reads are all 0)
         """
-        assert data_bits > 0
-        assert addr_bits > 0
-        assert addr_bits <= 32
-
-        self.a = Signal(addr_bits)
-        self.io_in = Signal(data_bits)
-        self.io_out = Signal(data_bits)
-        self._oe = Signal(1)
-        self._we = Signal(1)
+        super().__init__(data_bits, addr_bits, simulate=simulate)
         self.a_bits = addr_bits
         self.io_bits = data_bits
 
-        self.__mem = Array(
-            [Signal(data_bits, reset_less=True) for _ in range(2**addr_bits)]
-        )
-
-    def elaborate(self, _: Platform) -> Module:
-        m = Module()
-
-        # Data is written in on a positive edge
-        we_clk = ClockDomain("we_clk", clk_edge="pos", local=True)
-        m.domains.we_clk = we_clk
-        we_clk.clk = self._we
-
-        # Read out data if ~OE and not ~WE
-        m.d.comb += self.io_out.eq(0)
-        with m.If(~self._oe & self._we):
-            m.d.comb += self.io_out.eq(self.__mem[self.a])
+    @classmethod
+    def cycles(cls) -> List[Step]:
+        """Gets the datasheet cycles simulated by `sim` and `fast_sim`"""
+        # Simulates "AC Write Waveforms (~WE Controlled)" (p. 8)
+        # Simulates "AC Read Waveforms" (p. 6)
+        return [
+            # Write at address 0
+            ({"_oe": 1, "a": 0, "io_in": 0x1111, "_we": 0}, {}),
+            ({"_we": 1}, {}),
 
-        # When ~WE goes high, save the data
-        m.d.we_clk += self.__mem[self.a].eq(self.io_in)
+            # Write at address 1
+            ({"a": 1, "io_in": 0x2222, "_we": 0}, {}),
+            ({"_we": 1}, {}),
 
-        return m
+            # Stop inputing data and read back address 0
+            ({"io_in": 0, "a": 0, "_oe": 0}, {"io_out": 0x1111}),
+            ({"_oe": 1}, {}),
 
-    def ports(self):
-        """Gets the ports for a `EEProm`"""
-        return [
-            self.a,
-            self.io_in, self.io_out,
-            self._oe,
-            self._we
+            # Read back address 1
+            ({"a": 1, "_oe": 0}, {"io_out": 0x2222}),
+            ({"_oe": 1}, {}),
         ]
 
     @classmethod
-    def sim(cls):
-        """Simulate an `EEProm` with a 4 bit address and 16 bit data bus"""
+    def sim(cls, trace: Optional[bool] = None):
+        """
+        Simulate an `EEProm` with a 4 bit address and 16 bit data bus
+
+        Arguments:
+            trace: Whether to write `out/EEProm.vcd` (and `.gtkw`); defaults to
+                   `util.trace_vcd()`
+        """
+        if trace is None:
+            trace = trace_vcd()
+
         m = Module()
         m.submodules.rom = rom = EEProm(16, 4)
 
         sim = Simulator(m)
-
-        # Simulates "AC Write Waveforms (~WE Controlled)" (p. 8)
-        # Simulates "AC Read Waveforms" (p. 6)
-        def process():
-            yield rom._oe.eq(1)
-
-            # Write at address 0
-            yield rom.a.eq(0)
-            yield rom.io_in.eq(0x1111)
-            yield rom._we.eq(0)
-            yield Delay(1e-6)
-            yield rom._we.eq(1)
-            yield Delay(1e-6)
-
-            # Write at address 1
-            yield rom.a.eq(1)
-            yield rom.io_in.eq(0x2222)
-            yield rom._we.eq(0)
-            yield Delay(1e-6)
-            yield rom._we.eq(1)
-            yield Delay(1e-6)
-
-            # Stop inputing data
-            yield rom.io_in.eq(0)
-
-            # Read back address 0
-            yield rom.a.eq(0)
-            yield rom._oe.eq(0)
-            yield Delay(1e-6)
-            # read0 = yield rom.io_out
-            # want0 = yield rom.__mem[0]
-            # if read0 != want0:
-            #     print(f"ERROR: io_out({read0}) != mem[0]({want0})")
-            # if read0 != 0x1111:
-            #     print(f"ERROR: io_out({read0}) != 0x1111")
-            yield rom._oe.eq(1)
-            yield Delay(1e-6)
-
-            # Read back address 1
-            yield rom.a.eq(1)
-            yield rom._oe.eq(0)
-            yield Delay(1e-6)
-            # read1 = yield rom.io_out
-            # want1 = yield rom.__mem[1]
-            # if read1 != want1:
-            #     print(f"ERROR: io_out({read0}) != mem[1]({want0})")
-            # if read1 != 0x2222:
-            #     print(f"ERROR: io_out({read0}) != 0x2222")
-            yield rom._oe.eq(1)
-            yield Delay(1e-6)
+        process = stimulus(rom, Delay(1e-6), cls.cycles())
 
         sim.add_process(process)
+        if not trace:
+            sim.run()
+            return
+
         with sim.write_vcd("out/EEProm.vcd", "out/EEProm.gtkw", traces=rom.ports()):
             sim.run()
 
@@ -154,7 +102,8 @@ class EEProm(Elaboratable):
     def formal(cls) -> Tuple[Module, List[Signal]]:
         """Formally verify an `EEProm` with a 4 bit address and 16 bit data bus"""
         m = Module()
-        m.submodules.rom = rom = EEProm(16, 4)
+        # Only ever converted to RTLIL, never simulated (see `MemBlock`)
+        m.submodules.rom = rom = EEProm(16, 4, simulate=False)
 
         # TODO: Formally verify
 
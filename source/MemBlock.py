@@ -0,0 +1,194 @@
+"""
+The word addressable memory shared by `SRam` and `EEProm`
+"""
+
+# pylint error is for snake_case, but also covers short names
+# pylint: disable=C0103
+
+from abc import abstractmethod
+from typing import Callable, Dict, Iterable, List, Tuple
+from nmigen import ClockDomain, Elaboratable, Memory, Module, Mux, Signal
+from nmigen.build import Platform
+from util import Step, check_widths, words
+
+
+class MemBlock(Elaboratable):
+    """
+    A word addressable memory with asynchronous reads that writes on the
+    rising edge of ~WE, as used by both `SRam` and `EEProm`
+
+    The address and data signals are named by the subclass (`names`); below,
+    they are called by their defaults. Subclasses also describe their
+    datasheet cycles (`cycles`) for both `sim` and `fast_sim` to play back.
+
+    Attributes:
+        [I] addr:     The address lines
+        [I] data_in:  The input data
+        [O] data_out: The output data
+        [I] _oe:      Output enable (active low)
+        [I] _we:      Write enable (active low)
+            /: `__mem[addr] := data_in`
+    """
+    names: Tuple[str, str, str] = ("addr", "data_in", "data_out")
+    _oe: Signal
+    _we: Signal
+    data_bits: int
+    addr_bits: int
+    __addr: Signal
+    __data_in: Signal
+    __data_out: Signal
+    __mem: Memory
+    __steps: Dict[Tuple[type, int, int], Callable[..., int]] = {}
+
+    def __init__(self, data_bits: int, addr_bits: int, simulate: bool = True):
+        """
+        Constructs a `MemBlock`
+
+        Arguments:
+            data_bits: The width of the data bus
+            addr_bits: The width of the address bus
+            simulate:  Whether the memory will be run under nMigen's simulator
+                       (`False` skips building a `Signal` per word, which
+                       dominates constructing a large memory just for RTLIL)
+
+        Warning:
+            Never simulate a memory constructed with `simulate=False`; every
+            read silently returns 0. The simulator elaborates designs just
+            like `util.gen` does, so `elaborate` cannot catch this.
+        """
+        check_widths(data_bits, addr_bits)
+
+        addr_name, data_in_name, data_out_name = self.names
+        self.__addr = Signal(addr_bits, name=addr_name)
+        self.__data_in = Signal(data_bits, name=data_in_name)
+        self.__data_out = Signal(data_bits, name=data_out_name)
+        setattr(self, addr_name, self.__addr)
+        setattr(self, data_in_name, self.__data_in)
+        setattr(self, data_out_name, self.__data_out)
+        self._oe = Signal(1, name="_oe")
+        self._we = Signal(1, name="_we")
+        self.data_bits = data_bits
+        self.addr_bits = addr_bits
+
+        self.__mem = Memory(width=data_bits, depth=2**addr_bits, name="mem",
+                            simulate=simulate)
+
+    def elaborate(self, _: Platform) -> Module:
+        m = Module()
+
+        # Data is written in on a positive edge; the chip has no reset, and
+        #   the edge itself is the clock (no system clock is needed)
+        we_clk = ClockDomain("we_clk", clk_edge="pos", reset_less=True,
+                             local=True)
+        m.domains.we_clk = we_clk
+        we_clk.clk = self._we
+
+        rp = self.__mem.read_port(domain="comb")
+        wp = self.__mem.write_port(domain="we_clk")
+        m.submodules += [rp, wp]
+
+        # Read out data if ~OE and not ~WE
+        m.d.comb += rp.addr.eq(self.__addr)
+        m.d.comb += self.__data_out.eq(Mux(~self._oe & self._we, rp.data, 0))
+
+        # When ~WE goes high, save the data
+        m.d.comb += [
+            wp.addr.eq(self.__addr),
+            wp.data.eq(self.__data_in),
+            wp.en.eq(1),
+        ]
+
+        return m
+
+    def load(self, data: Iterable[int]):
+        """
+        Sets the initial contents of the memory, starting at address 0
+
+        Each word is truncated to `data_bits` bits. This costs no simulated
+        cycles and is kept in the generated RTLIL, but must be done before the
+        memory is elaborated. For the `to_py` model, use `util.load_words`
+        instead.
+
+        Arguments:
+            data: The words to load (e.g. a list or a NumPy array)
+        """
+        mask = (1 << self.data_bits) - 1
+        self.__mem.init = [int(word) & mask for word in data]
+
+    def ports(self) -> List[Signal]:
+        """Gets the ports for a `MemBlock`"""
+        return [
+            self.__addr,
+            self.__data_in,
+            self.__data_out,
+            self._oe,
+            self._we
+        ]
+
+    @classmethod
+    def to_py(cls, data_bits: int, addr_bits: int) -> str:
+        """
+        Generates the source of a straight-line Python model of the memory
+
+        The generated `step(_oe, _we, addr, data_in, mem)` settles one cycle
+        against `mem` (`2**addr_bits` words, as from `util.words`) and returns
+        the value of `data_out`. As the datasheets require, `addr` and
+        `data_in` must be held stable for as long as `_we` is low.
+
+        The bus widths are baked into the source as literal masks, truncating
+        the inputs like assigning them to the nMigen signals would.
+
+        Arguments:
+            data_bits: The width of the data bus
+            addr_bits: The width of the address bus
+        """
+        return (
+            "def step(_oe, _we, addr, data_in, mem):\n"
+            f"    addr &= {(1 << addr_bits) - 1:#x}\n"
+            "    if not _we:\n"
+            f"        mem[addr] = data_in & {(1 << data_bits) - 1:#x}\n"
+            "        return 0\n"
+            "    return 0 if _oe else mem[addr]\n"
+        )
+
+    @classmethod
+    def step(cls, data_bits: int, addr_bits: int) -> Callable[..., int]:
+        """
+        Gets the function generated by `to_py`, compiling it only once for
+        each class and pair of bus widths
+        """
+        key = (cls, data_bits, addr_bits)
+        if key not in cls.__steps:
+            namespace = {}
+            exec(cls.to_py(data_bits, addr_bits), namespace)
+            cls.__steps[key] = namespace["step"]
+        return cls.__steps[key]
+
+    @classmethod
+    @abstractmethod
+    def cycles(cls) -> List[Step]:
+        """
+        Gets the datasheet cycles simulated by `sim` and `fast_sim`, as steps
+        for `util.stimulus`
+        """
+
+    @classmethod
+    def fast_sim(cls):
+        """
+        Simulate the `cycles` of a memory with a 4 bit address and 16 bit data
+        bus using the model from `to_py` instead of nMigen's simulator
+        """
+        step = cls.step(16, 4)
+        mem = words(16, 2**4)
+        addr_name, data_in_name, data_out_name = cls.names
+
+        # Like the signals, every input starts out at 0
+        inputs = {"_oe": 0, "_we": 0, addr_name: 0, data_in_name: 0}
+        for changed, expected in cls.cycles():
+            inputs.update(changed)
+            data_out = step(inputs["_oe"], inputs["_we"], inputs[addr_name],
+                            inputs[data_in_name], mem)
+
+            want = expected.get(data_out_name)
+            if want is not None and data_out != want:
+                print(f"ERROR: {data_out_name}({data_out:#x}) != {want:#x}")
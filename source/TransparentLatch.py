@@ -7,12 +7,19 @@ https://assets.nexperia.com/documents/data-sheet/74HC_HCT373.pdf
 # pylint error is for snake_case, but also covers short names
 # pylint: disable=C0103
 
-from typing import List, Tuple
-from nmigen import Array, ClockDomain, Elaboratable, Module, Mux, Signal
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+from nmigen import Array, ClockDomain, Const, Elaboratable, Module, Mux, Signal
 from nmigen.build import Platform
 from nmigen.sim import Simulator, Delay
 from nmigen.asserts import Assert, Assume, Cover, Fell, Past, Rose, Stable
-from util import main
+from util import Step, check_widths, main, stimulus, trace_vcd
+
+
+@lru_cache(maxsize=None)
+def _zero(bits: int) -> Const:
+    """Gets a zero `Const` of `bits` bits, shared by all latches that wide"""
+    return Const(0, bits)
 
 
 class TransparentLatch(Elaboratable):
@@ -43,28 +50,30 @@ class TransparentLatch(Elaboratable):
         Arguments:
             bits: The width of the latch
         """
-        assert bits > 0
+        check_widths(bits, data_name="bits")
 
-        self.d = Signal(bits)
-        self.q = Signal(bits)
-        self.le = Signal(1)
-        self._oe = Signal(1)
+        self.d = Signal(bits, name="d")
+        self.q = Signal(bits, name="q")
+        self.le = Signal(1, name="le")
+        self._oe = Signal(1, name="_oe")
         self.bits = bits
 
     def elaborate(self, _: Platform) -> Module:
         m = Module()
 
-        internal_reg = Signal(self.bits, reset=0, reset_less=True)
+        internal_reg = Signal(self.bits, reset=0, reset_less=True,
+                              name="internal_reg")
 
-        # The 74x373 clocks on the negative edge
-        le_clk = ClockDomain("le_clk", clk_edge="neg", local=True)
+        # The 74x373 clocks on the negative edge, and has no reset
+        le_clk = ClockDomain("le_clk", clk_edge="neg", reset_less=True,
+                             local=True)
         m.domains.le_clk = le_clk
         le_clk.clk = self.le
 
         m.d.le_clk += internal_reg.eq(self.d)
-        m.d.comb += self.q.eq(Mux(self._oe, 0, internal_reg))
-        with m.If(self.le & ~self._oe):
-            m.d.comb += self.q.eq(self.d)
+        # ~OE overrides LE; otherwise LE picks between `d` and the latched data
+        m.d.comb += self.q.eq(
+            Mux(self._oe, _zero(self.bits), Mux(self.le, self.d, internal_reg)))
 
         return m
 
@@ -78,33 +87,84 @@ class TransparentLatch(Elaboratable):
         ]
 
     @classmethod
-    def sim(cls):
-        """Simulate a `TransparentLatch` of 16 bits"""
+    def step(cls, bits: int) -> Callable[[int, int, int, int], int]:
+        """
+        Gets a pure Python model of the output of a `TransparentLatch`
+
+        The returned `step(d, le, _oe, internal_reg)` gives the value of `q`,
+        truncated to `bits` like assigning the inputs to the nMigen signals
+        would.
+
+        Arguments:
+            bits: The width of the latch
+        """
+        mask = (1 << bits) - 1
+
+        def step(d: int, le: int, _oe: int, internal_reg: int) -> int:
+            return 0 if _oe else ((d if le else internal_reg) & mask)
+        return step
+
+    @classmethod
+    def cycles(cls) -> List[Step]:
+        """Gets the cycles simulated by `sim` and `fast_sim`"""
+        # Write in data twice
+        return [
+            ({"_oe": 1, "le": 1}, {"q": 0}),
+            ({"d": 0x1234}, {"q": 0}),
+            ({"d": 0x5678}, {"q": 0}),
+            ({"le": 0}, {"q": 0}),
+            ({"d": 0x1234}, {"q": 0}),
+            ({"le": 1}, {"q": 0}),
+            ({"_oe": 0}, {"q": 0x1234}),
+        ]
+
+    @classmethod
+    def fast_sim(cls):
+        """
+        Simulate the `cycles` of a `TransparentLatch` of 16 bits using the
+        model from `step` instead of nMigen's simulator
+        """
+        step = cls.step(16)
+        internal_reg = 0
+
+        # Like the signals, every input starts out at 0
+        inputs = {"d": 0, "le": 0, "_oe": 0}
+        for changed, expected in cls.cycles():
+            le = inputs["le"]
+            inputs.update(changed)
+
+            # The 74x373 clocks on the negative edge
+            if le and not inputs["le"]:
+                internal_reg = inputs["d"]
+
+            q = step(inputs["d"], inputs["le"], inputs["_oe"], internal_reg)
+            want = expected.get("q")
+            if want is not None and q != want:
+                print(f"ERROR: q({q:#x}) != {want:#x}")
+
+    @classmethod
+    def sim(cls, trace: Optional[bool] = None):
+        """
+        Simulate the `cycles` of a `TransparentLatch` of 16 bits
+
+        Arguments:
+            trace: Whether to write `out/TransparentLatch.vcd` (and `.gtkw`);
+                   defaults to `util.trace_vcd()`
+        """
+        if trace is None:
+            trace = trace_vcd()
+
         m = Module()
         m.submodules.latch = latch = TransparentLatch(16)
 
         sim = Simulator(m)
-
-        def process():
-            yield latch._oe.eq(1)
-
-            # Write in data twice
-            yield latch.le.eq(1)
-            yield Delay(1e-6)
-            yield latch.d.eq(0x1234)
-            yield Delay(1e-6)
-            yield latch.d.eq(0x5678)
-            yield Delay(1e-6)
-            yield latch.le.eq(0)
-            yield Delay(1e-6)
-            yield latch.d.eq(0x1234)
-            yield Delay(1e-6)
-            yield latch.le.eq(1)
-            yield Delay(1e-6)
-            yield latch._oe.eq(0)
-            yield Delay(1e-6)
+        process = stimulus(latch, Delay(1e-6), cls.cycles())
 
         sim.add_process(process)
+        if not trace:
+            sim.run()
+            return
+
         with sim.write_vcd("out/TransparentLatch.vcd", "out/TransparentLatch.gtkw", traces=latch.ports()):
             sim.run()
 
@@ -1,4 +1,15 @@
+import array
+import glob
+import hashlib
+import importlib
+import inspect
+import os
+import platform
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 from nmigen.back import rtlil
 from nmigen.hdl import Fragment
@@ -7,17 +18,250 @@ if sys.version_info < (3, 9):
     print("Python 3.9 or higher is required.")
     sys.exit(1)
 
+# A simulation step for `stimulus`: `(inputs, expected outputs)` by name
+Step = Tuple[Dict[str, int], Dict[str, int]]
+
 
 def main(cls, filename: str):
-    if len(sys.argv) < 2 or (sys.argv[1] != "sim" and sys.argv[1] != "gen"):
-        print(f"Usage: python {sys.argv[0]} sim|gen")
+    # `fastsim` runs a pure Python model, for the classes that provide one
+    commands = ["sim", "fastsim", "gen"] if hasattr(cls, "fast_sim") \
+        else ["sim", "gen"]
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(f"Usage: python {sys.argv[0]} {'|'.join(commands)}")
+        print(f"       pypy3 {sys.argv[0]} {'|'.join(commands)}")
+        print("Set MACRO86_VCD=1 to write a VCD when simulating")
         sys.exit(1)
 
+    if platform.python_implementation() == "PyPy":
+        # PyPy counts stack frames differently than CPython; give nMigen's
+        #   recursive AST walkers (and pysim's compiler) some headroom
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+
     if sys.argv[1] == "sim":
         cls.sim()
+    elif sys.argv[1] == "fastsim":
+        cls.fast_sim()
+    else:
+        gen(cls, filename)
+
+
+def gen(cls, filename: str):
+    """
+    Writes the RTLIL for `cls.formal()` to `filename`
+
+    The output is cached in `.cache/` next to `filename`, keyed by the nMigen
+    version and the source of its RTLIL backend, of `cls` and its base
+    classes, and of every module in the directory `cls` is defined in, so
+    regenerating an unchanged design skips elaboration and conversion
+    entirely. Submodules from anywhere else (besides the base classes) are
+    not covered; delete the cache after changing them. Only the newest entry
+    for each class is kept. Classes without source files available (e.g.
+    defined interactively) are never cached.
+    """
+    try:
+        cache_dir = os.path.join(os.path.dirname(filename), ".cache")
+        cached = os.path.join(cache_dir,
+                              f"{cls.__qualname__}-{_cache_key(cls)}.il")
+    except (OSError, TypeError):
+        cached = None
+    if cached and os.path.exists(cached):
+        shutil.copyfile(cached, filename)
+        return
+
+    design, ports = cls.formal()
+    fragment = Fragment.get(design, None)
+
+    # Encode once and write the bytes as-is to both files; text mode would
+    #   re-buffer (and newline translate) the whole, possibly huge, string
+    output = rtlil.convert(fragment, ports=ports).encode()
+    with open(filename, "wb") as f:
+        f.write(output)
+
+    if cached:
+        # Move a finished file into place, so an interrupted run (or two
+        #   `gen_many` workers) can never leave a truncated entry behind
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(output)
+            # `mkstemp` makes the file private; match the `.il` next to it
+            os.chmod(temp, 0o644)
+            os.replace(temp, cached)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+        # Entries for older versions of the design are never used again
+        pattern = os.path.join(glob.escape(cache_dir),
+                               f"{glob.escape(cls.__qualname__)}-*.il")
+        for stale in glob.glob(pattern):
+            if stale != cached:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+
+def gen_many(jobs: Iterable[Tuple[type, str]]):
+    """
+    Runs `gen` for every `(cls, filename)` in `jobs`, each in its own process
+
+    Designs are independent until they're wired together, so elaborating them
+    in parallel scales with the number of cores. Workers share `gen`'s cache,
+    so only changed designs are actually elaborated.
+    """
+    with ProcessPoolExecutor() as pool:
+        futures = [pool.submit(gen, cls, filename) for cls, filename in jobs]
+    for future in futures:
+        future.result()
+
+
+def _cache_key(cls) -> str:
+    """
+    Hashes the nMigen version, its RTLIL backend, this file, and the source
+    of `cls`, its base classes, and the modules next to it
+    """
+    backend = sys.modules[rtlil.convert.__module__]
+    toolchain = sys.modules[backend.__name__.partition(".")[0]]
+
+    modules = {sys.modules[__name__], backend}
+    modules.update(sys.modules[klass.__module__] for klass in cls.__mro__
+                   if klass.__module__ != "builtins")
+    paths = {inspect.getfile(module) for module in modules}
+    paths.update(glob.glob(
+        os.path.join(os.path.dirname(inspect.getfile(cls)), "*.py")))
+
+    key = hashlib.sha1(cls.__qualname__.encode())
+    key.update(str(getattr(toolchain, "__version__", "")).encode())
+    for path in sorted(os.path.abspath(path) for path in paths):
+        with open(path, "rb") as f:
+            key.update(f.read())
+    return key.hexdigest()
+
+
+def check_widths(data_bits: int, addr_bits: Optional[int] = None,
+                 max_addr: int = 32, data_name: str = "data_bits"):
+    """
+    Checks the bus widths given to a constructor
+
+    The checks are `assert`s, so running Python with `-O` skips them, e.g. for
+    elaborating many known good blocks.
+
+    Arguments:
+        data_bits: The width of the data bus (must be positive)
+        addr_bits: The width of the address bus, if there is one (must be
+                   positive and at most `max_addr`)
+        max_addr:  The widest address bus allowed
+        data_name: The caller's name for `data_bits`, for the error message
+    """
+    assert data_bits > 0, f"{data_name} must be positive, not {data_bits}"
+    if addr_bits is not None:
+        assert 0 < addr_bits <= max_addr, \
+            f"addr_bits must be in 1..{max_addr}, not {addr_bits}"
+
+
+def trace_vcd() -> bool:
+    """
+    Gets whether `sim()`s write VCDs by default, from `MACRO86_VCD`
+
+    Tracing is off unless the variable is set to something other than `0`.
+    """
+    return os.environ.get("MACRO86_VCD", "0") not in ("", "0")
+
+
+def stimulus(dut, delay, steps: Iterable[Step]):
+    """
+    Makes a sim process that plays back `steps` against `dut`
+
+    Each step is `(inputs, expected)`, both mapping signal names of `dut` to
+    values. The inputs that changed since the last step are set, `delay` is
+    waited once, and then every expected output is checked (printing an
+    `ERROR` on a mismatch).
+
+    The assignments are all built up front, so the process only has to yield
+    prepared commands.
+    """
+    plan = []
+    driven = {}
+    for inputs, expected in steps:
+        assignments = []
+        for name, value in inputs.items():
+            if driven.get(name) != value:
+                driven[name] = value
+                assignments.append(getattr(dut, name).eq(value))
+        checks = [(name, getattr(dut, name), value)
+                  for name, value in expected.items()]
+        plan.append((assignments, checks))
+
+    def process():
+        for assignments, checks in plan:
+            for assignment in assignments:
+                yield assignment
+            yield delay
+            for name, signal, want in checks:
+                got = yield signal
+                if got != want:
+                    print(f"ERROR: {name}({got:#x}) != {want:#x}")
+
+    return process
+
+
+def words(data_bits: int, depth: int) -> array.array:
+    """
+    Allocates a zeroed array of `depth` words of `data_bits` bits each
+
+    The array uses the smallest machine type wide enough for the data, so a
+    memory costs `depth * itemsize` bytes instead of a Python object per word.
+    """
+    for typecode in "BHILQ":
+        itemsize = array.array(typecode).itemsize
+        if itemsize * 8 >= data_bits:
+            return array.array(typecode, bytes(itemsize * depth))
+    raise ValueError(f"No array type can hold {data_bits} bit words")
+
+
+def words_view(mem: array.array):
+    """
+    Gets a (writable) NumPy view of an array from `words`, sharing its buffer
+
+    NumPy is only needed by callers of this function.
+    """
+    import numpy  # pylint: disable=import-outside-toplevel
+    return numpy.frombuffer(mem, dtype=f"u{mem.itemsize}")
+
+
+def load_words(mem: array.array, data, data_bits: int):
+    """
+    Copies `data` into an array from `words`, starting at index 0
+
+    Each word is truncated to `data_bits` bits, like `MemBlock.load` and
+    the writes of `MemBlock.to_py` do. A NumPy array is copied in one go
+    through `words_view`; anything else is converted with `array.array`
+    first.
+    """
+    if len(data) > len(mem):
+        raise ValueError(f"Cannot load {len(data)} words into {len(mem)}")
+
+    mask = (1 << data_bits) - 1
+    if hasattr(data, "__array__"):
+        import numpy  # pylint: disable=import-outside-toplevel
+        # Mask in the view's own type; `mask` may not fit the type of `data`
+        view = words_view(mem)
+        data = numpy.asarray(data).astype(view.dtype, casting="unsafe")
+        view[:len(data)] = data & view.dtype.type(mask)
     else:
-        design, ports = cls.formal()
-        fragment = Fragment.get(design, None)
-        output = rtlil.convert(fragment, ports=ports)
-        with open(filename, "w") as f:
-            f.write(output)
+        mem[:len(data)] = array.array(mem.typecode,
+                                      (int(word) & mask for word in data))
+
+
+if __name__ == "__main__":
+    # `python util.py gen SRam EEProm` generates `out/SRam.il` and
+    #   `out/EEProm.il` in parallel; each module must define a class of the
+    #   same name
+    if len(sys.argv) < 3 or sys.argv[1] != "gen":
+        print(f"Usage: python {sys.argv[0]} gen MODULE...")
+        sys.exit(1)
+
+    gen_many((getattr(importlib.import_module(name), name), f"out/{name}.il")
+             for name in sys.argv[2:])